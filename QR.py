@@ -1,6 +1,8 @@
 import math
+from functools import lru_cache
 from typing import List
 from enum import Enum
+import numpy as np
 from PIL import Image
 
 class ErrorCorrectionLevel(Enum):
@@ -10,6 +12,144 @@ class ErrorCorrectionLevel(Enum):
     Q = 2  # 25% коррекции ошибок
     H = 3  # 30% коррекции ошибок
 
+# Таблицы по версиям (индекс 0 не используется)
+_SIZE_BY_VERSION = tuple((v - 1) * 4 + 21 for v in range(41))
+
+def _check_version(version: int):
+    """Проверка номера версии перед обращением к таблицам по версиям"""
+    if not 1 <= version <= 40:
+        raise ValueError(f"Версия QR-кода должна быть от 1 до 40, получено {version}")
+
+# Длина индикатора количества символов, индексы: [версия][уровень коррекции]
+_COUNT_BITS_BY_VERSION = tuple(
+    (10, 10, 8, 8) if 1 <= v <= 9 else (12, 12, 12, 12)
+    for v in range(41)
+)
+
+def _overlaps_finder(x: int, y: int, size: int) -> bool:
+    """Попадает ли центр выравнивающего паттерна в зону паттерна поиска"""
+    return (x < 9 and y < 9) or (x > size - 10 and y < 9) or (x < 9 and y > size - 10)
+
+def _alignment_positions_for(version: int) -> tuple:
+    """Центры выравнивающих паттернов по ISO/IEC 18004 без пересечений с паттернами поиска"""
+    if version < 2:
+        return ()
+    
+    size = _SIZE_BY_VERSION[version]
+    count = version // 7 + 2
+    step = 26 if version == 32 else (version * 4 + count * 2 + 1) // (count * 2 - 2) * 2
+    coords = [6] + [size - 7 - i * step for i in range(count - 2, -1, -1)]
+    
+    return tuple(
+        (x, y) for y in coords for x in coords
+        if not _overlaps_finder(x, y, size)
+    )
+
+_ALIGNMENT_POSITIONS_BY_VERSION = tuple(_alignment_positions_for(v) for v in range(41))
+
+# Шаблон паттерна поиска 7x7
+_FINDER = np.array([
+    [1, 1, 1, 1, 1, 1, 1],
+    [1, 0, 0, 0, 0, 0, 1],
+    [1, 0, 1, 1, 1, 0, 1],
+    [1, 0, 1, 1, 1, 0, 1],
+    [1, 0, 1, 1, 1, 0, 1],
+    [1, 0, 0, 0, 0, 0, 1],
+    [1, 1, 1, 1, 1, 1, 1],
+], dtype=np.uint8)
+
+# Шаблон выравнивающего паттерна 5x5
+_ALIGN = np.array([
+    [1, 1, 1, 1, 1],
+    [1, 0, 0, 0, 1],
+    [1, 0, 1, 0, 1],
+    [1, 0, 0, 0, 1],
+    [1, 1, 1, 1, 1],
+], dtype=np.uint8)
+
+# Условия масок 0-7 (y - строка, x - столбец)
+_MASK_PATTERNS = (
+    lambda y, x: (y + x) % 2 == 0,
+    lambda y, x: y % 2 == 0,
+    lambda y, x: x % 3 == 0,
+    lambda y, x: (y + x) % 3 == 0,
+    lambda y, x: (y // 2 + x // 3) % 2 == 0,
+    lambda y, x: (y * x) % 2 + (y * x) % 3 == 0,
+    lambda y, x: ((y * x) % 2 + (y * x) % 3) % 2 == 0,
+    lambda y, x: ((y + x) % 2 + (y * x) % 3) % 2 == 0,
+)
+
+# Последовательности 1011101 0000 и 0000 1011101 для правила N3
+_FINDER_LIKE = (
+    (1, 0, 1, 1, 1, 0, 1, 0, 0, 0, 0),
+    (0, 0, 0, 0, 1, 0, 1, 1, 1, 0, 1),
+)
+
+# Биты уровня коррекции в информации о формате: L=01, M=00, Q=11, H=10
+_FORMAT_EC_BITS = (1, 0, 3, 2)
+
+def _format_bits(error_correction: ErrorCorrectionLevel, mask_pattern: int) -> int:
+    """15-битная информация о формате: BCH(15,5) и маска 101010000010010"""
+    data = _FORMAT_EC_BITS[error_correction.value] << 3 | mask_pattern
+    remainder = data
+    for _ in range(10):
+        remainder = (remainder << 1) ^ ((remainder >> 9) * 0x537)
+    
+    return (data << 10 | remainder) ^ 0x5412
+
+# Упрощенная таблица емкости (числовой режим), ключ: (версия, уровень коррекции)
+_CAPACITY = {
+    (1, 0): 41,
+    (1, 1): 34,
+    (1, 2): 27,
+    (1, 3): 17,
+}
+
+# Упрощенная таблица числа кодовых слов коррекции, ключ: (версия, уровень коррекции)
+_EC_CODEWORDS = {
+    (1, 0): 7,
+    (1, 1): 10,
+    (1, 2): 13,
+    (1, 3): 17,
+}
+
+def _build_gf_tables() -> tuple:
+    """Таблицы степеней и логарифмов GF(2^8) с примитивным многочленом 0x11d"""
+    gf_exp = np.zeros(512, dtype=np.uint8)
+    gf_log = np.zeros(256, dtype=np.int64)
+    
+    x = 1
+    for i in range(255):
+        gf_exp[i] = x
+        gf_log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= 0x11d
+    
+    # Удвоение таблицы позволяет складывать логарифмы без взятия по модулю 255
+    gf_exp[255:510] = gf_exp[:255]
+    
+    return gf_exp, gf_log
+
+_GF_EXP, _GF_LOG = _build_gf_tables()
+
+# Битовые потоки хранятся как np.uint8, по одному биту в элементе
+_MODE_NUMERIC = np.array([0, 0, 0, 1], dtype=np.uint8)
+_MODE_BYTE = np.array([0, 1, 0, 0], dtype=np.uint8)
+_TERMINATOR = np.zeros(4, dtype=np.uint8)
+
+# Битовые представления групп цифр: 3 цифры -> 10 бит, 2 -> 7, 1 -> 4
+def _bit_table(count: int, bit_length: int) -> np.ndarray:
+    shifts = np.arange(bit_length - 1, -1, -1)
+    return ((np.arange(count)[:, None] >> shifts) & 1).astype(np.uint8)
+
+_NUM10 = _bit_table(1000, 10)
+_NUM7 = _bit_table(100, 7)
+_NUM4 = _bit_table(10, 4)
+
+# Блок заполнения 11101100
+_PAD_BLOCK = np.array([1, 1, 1, 0, 1, 1, 0, 0], dtype=np.uint8)
+
 class DataEncoder:
     """Модуль кодирования данных для QR-кодов"""
     
@@ -19,17 +159,10 @@ class DataEncoder:
         self.capacity = self._get_capacity()
         
     def _get_capacity(self) -> int:
-        """Упрощенная таблица емкости (числовой режим)"""
-        capacities = {
-            (1, ErrorCorrectionLevel.L): 41,
-            (1, ErrorCorrectionLevel.M): 34,
-            (1, ErrorCorrectionLevel.Q): 27,
-            (1, ErrorCorrectionLevel.H): 17,
-            
-        }
-        return capacities.get((self.version, self.error_correction), 100)
+        
+        return _CAPACITY.get((self.version, self.error_correction.value), 100)
     
-    def encode(self, data: str) -> List[int]:
+    def encode(self, data: str) -> np.ndarray:
         """Кодирование данных по стандарту QR-кода"""
         # Выбор режима кодирования на основе входных данных
         if data.isdigit():
@@ -37,107 +170,146 @@ class DataEncoder:
         else:
             return self._encode_byte(data)
     
-    def _encode_numeric(self, data: str) -> List[int]:
+    def _encode_numeric(self, data: str) -> np.ndarray:
         """Кодирование числовых данных"""
         result = []
         
         # Индикатор режима
-        result.extend([0, 0, 0, 1])
+        result.append(_MODE_NUMERIC)
         
         # Индикатор количества символов
         count_bits = self._get_character_count_bits()
         char_count = len(data)
-        result.extend(self._number_to_bits(char_count, count_bits))
+        result.append(self._number_to_bits(char_count, count_bits))
         
         # Кодирование числовых данных группами по 3 цифры
-        i = 0
-        while i < len(data):
-            if i + 3 <= len(data):
-                
-                number = int(data[i:i+3])
-                result.extend(self._number_to_bits(number, 10))
-                i += 3
-            elif i + 2 <= len(data):
-                
-                number = int(data[i:i+2])
-                result.extend(self._number_to_bits(number, 7))
-                i += 2
-            else:
-                
-                number = int(data[i])
-                result.extend(self._number_to_bits(number, 4))
-                i += 1
+        grouped_len = len(data) - len(data) % 3
+        for i in range(0, grouped_len, 3):
+            result.append(_NUM10[int(data[i:i+3])])
         
+        # Остаток из 2 или 1 цифры
+        tail = data[grouped_len:]
+        if len(tail) == 2:
+            result.append(_NUM7[int(tail)])
+        elif len(tail) == 1:
+            result.append(_NUM4[int(tail)])
         
-        result.extend([0, 0, 0, 0])
         
+        result.append(_TERMINATOR)
         
-        while len(result) < self.capacity:
-            result.extend([1, 1, 1, 0, 1, 1, 0, 0])  
-    
-        return result[:self.capacity]
+        
+        return self._add_padding(result)
     
-    def _encode_byte(self, data: str) -> List[int]:
+    def _encode_byte(self, data: str) -> np.ndarray:
         
         result = []
         
         # Индикатор режима (0100 для байтового режима)
-        result.extend([0, 1, 0, 0])
+        result.append(_MODE_BYTE)
         
         # Индикатор количества символов
         count_bits = self._get_character_count_bits()
-        char_count = len(data.encode('utf-8'))
-        result.extend(self._number_to_bits(char_count, count_bits))
+        encoded = data.encode('utf-8')
+        result.append(self._number_to_bits(len(encoded), count_bits))
         
-        # Кодирование каждого байта
-        for byte in data.encode('utf-8'):
-            result.extend(self._number_to_bits(byte, 8))
+        # Кодирование всех байтов за один вызов
+        result.append(np.unpackbits(np.frombuffer(encoded, dtype=np.uint8)))
         
         # Добавление терминатора
-        result.extend([0, 0, 0, 0])
+        result.append(_TERMINATOR)
         
         # Добавление заполнения
-        while len(result) < self.capacity:
-            result.extend([1, 1, 1, 0, 1, 1, 0, 0])
+        return self._add_padding(result)
+    
+    def _add_padding(self, chunks: List[np.ndarray]) -> np.ndarray:
+        """Сборка битового потока и дополнение до емкости"""
+        result = np.concatenate(chunks)
+        pad_needed = max(0, self.capacity - len(result))
+        padding = np.resize(_PAD_BLOCK, pad_needed)
         
-        return result[:self.capacity]
+        return np.concatenate([result, padding])[:self.capacity]
     
     def _get_character_count_bits(self) -> int:
         
-        if 1 <= self.version <= 9:
-            return 10 if self.error_correction in [ErrorCorrectionLevel.L, ErrorCorrectionLevel.M] else 8
-        else:
-            return 12
+        return _COUNT_BITS_BY_VERSION[self.version][self.error_correction.value]
     
-    def _number_to_bits(self, number: int, bit_length: int) -> List[int]:
+    def _number_to_bits(self, number: int, bit_length: int) -> np.ndarray:
         
-        return [int(bit) for bit in format(number, f'0{bit_length}b')]
+        if number >> bit_length:
+            raise ValueError(f"Число {number} не помещается в {bit_length} бит")
+        
+        shifts = np.arange(bit_length - 1, -1, -1)
+        return ((number >> shifts) & 1).astype(np.uint8)
 
 class ReedSolomon:
+    """Коды Рида-Соломона над GF(2^8)"""
     
+    def encode(self, data: np.ndarray, version: int, error_correction: ErrorCorrectionLevel) -> np.ndarray:
+        """Добавление кодовых слов коррекции ошибок к битовому потоку"""
+        ec_codewords = _EC_CODEWORDS.get((version, error_correction.value), 10)
+        
+        # Биты -> кодовые слова (неполный последний байт дополняется нулями)
+        message = np.packbits(data)
+        remainder = self._remainder(message, _rs_generator_log(ec_codewords))
+        
+        return np.concatenate([data, np.unpackbits(remainder)])
     
-    def encode(self, data: List[int], version: int, error_correction: ErrorCorrectionLevel) -> List[int]:
+    def _remainder(self, message: np.ndarray, generator_log: np.ndarray) -> np.ndarray:
+        """Остаток от деления message * x^n на порождающий многочлен"""
+        remainder = np.zeros(len(generator_log), dtype=np.uint8)
+        
+        for byte in message.tolist():
+            factor = byte ^ int(remainder[0])
+            remainder[:-1] = remainder[1:]
+            remainder[-1] = 0
+            if factor:
+                # Умножение всех коэффициентов за одну векторную операцию
+                remainder ^= _GF_EXP[_GF_LOG[factor] + generator_log]
         
-        return data + data[:10]  # Простая избыточность
+        return remainder
+
+@lru_cache(maxsize=None)
+def _rs_generator_log(degree: int) -> np.ndarray:
+    """Логарифмы коэффициентов (x - a^0)(x - a^1)...(x - a^(degree-1)) без старшего"""
+    generator = [1]
+    for i in range(degree):
+        product = generator + [0]
+        for j, coef in enumerate(generator):
+            if coef:
+                product[j + 1] ^= int(_GF_EXP[_GF_LOG[coef] + i])
+        generator = product
+    
+    generator_log = _GF_LOG[generator[1:]]
+    generator_log.flags.writeable = False
+    return generator_log
 
 class MatrixConstructor:
     """Построитель матрицы QR-кода"""
     
-    def __init__(self, version: int):
+    def __init__(self, version: int, error_correction: ErrorCorrectionLevel = ErrorCorrectionLevel.M):
+        _check_version(version)
         self.version = version
-        self.size = (version - 1) * 4 + 21
-        self.matrix = [[False] * self.size for _ in range(self.size)]
-    
-    def build_matrix(self, data: List[int]) -> List[List[bool]]:
+        self.error_correction = error_correction
+        self.size = _SIZE_BY_VERSION[version]
+        self.matrix = np.zeros((self.size, self.size), dtype=np.uint8)
+        self._func_mask = None
+        self._data_masks = None
+        self._mask_lines = None
+        self._placement_order = None
+        self.mask_pattern = None
+    
+    def build_matrix(self, data: np.ndarray) -> np.ndarray:
         """Построение полной матрицы QR-кода"""
-        self._add_finder_patterns()
-        self._add_alignment_patterns()
-        self._add_timing_patterns()
-        self._add_dark_module()
-        self._add_format_info()
+        # Служебные паттерны и маски зависят только от версии
+        (template, self._func_mask, self._data_masks,
+         self._mask_lines, self._placement_order) = _function_template(self.version)
+        self.matrix = template.copy()
         self._add_data(data)
         self._apply_mask()
         
+        # Информация о формате зависит от выбранной маски, поэтому не входит в шаблон
+        self._add_format_info()
+        
         return self.matrix
     
     def _add_finder_patterns(self):
@@ -149,107 +321,214 @@ class MatrixConstructor:
         ]
         
         for x, y in patterns_pos:
-            
-            for i in range(7):
-                for j in range(7):
-                    if i == 0 or i == 6 or j == 0 or j == 6:
-                        self.matrix[y + j][x + i] = True
-                    elif 2 <= i <= 4 and 2 <= j <= 4:
-                        self.matrix[y + j][x + i] = True
-                    else:
-                        self.matrix[y + j][x + i] = False
+            self.matrix[y:y + 7, x:x + 7] = _FINDER
     
     def _add_alignment_patterns(self):
         
-        if self.version == 1:
-            return
-        
-        
-        positions = self._get_alignment_positions()
-        
-        for x, y in positions:
-            
-            if (x < 9 and y < 9) or (x > self.size - 10 and y < 9) or (x < 9 and y > self.size - 10):
-                continue
-            
-            
-            for i in range(5):
-                for j in range(5):
-                    if i == 0 or i == 4 or j == 0 or j == 4:
-                        self.matrix[y + j - 2][x + i - 2] = True
-                    elif i == 2 and j == 2:
-                        self.matrix[y + j - 2][x + i - 2] = True
-                    else:
-                        self.matrix[y + j - 2][x + i - 2] = False
-    
-    def _get_alignment_positions(self) -> List[tuple]:
-        
-        if 2 <= self.version <= 6:
-            return [(self.size - 7, self.size - 7)]
-        else:
-            
-            return [(self.size - 9, self.size - 9)]
+        for x, y in _ALIGNMENT_POSITIONS_BY_VERSION[self.version]:
+            self.matrix[y - 2:y + 3, x - 2:x + 3] = _ALIGN
     
     def _add_timing_patterns(self):
     
-        for i in range(8, self.size - 8):
-            self.matrix[6][i] = (i % 2 == 0)
-        
-        
-        for i in range(8, self.size - 8):
-            self.matrix[i][6] = (i % 2 == 0)
+        timing = (np.arange(8, self.size - 8) % 2 == 0).astype(np.uint8)
+        self.matrix[6, 8:self.size - 8] = timing
+        self.matrix[8:self.size - 8, 6] = timing
     
     def _add_dark_module(self):
         
-        self.matrix[4 * self.version + 9][8] = True
+        self.matrix[4 * self.version + 9, 8] = 1
     
     def _add_format_info(self):
     
-        # Упрощенная информация о формате 
-        format_info = [False] * 15
-        
-        for i in range(15):
-            if i < 8:
-                self.matrix[8][i if i != 6 else 7] = format_info[i]
-            else:
-                self.matrix[14 - i][8] = format_info[i]
-    
-    def _add_data(self, data: List[int]):
-        # Упрощенное размещение данных 
-        bit_index = 0
-        for y in range(self.size):
-            for x in range(self.size):
-                if not self._is_function_pattern(x, y) and bit_index < len(data):
-                    self.matrix[y][x] = bool(data[bit_index])
-                    bit_index += 1
-    
-    def _is_function_pattern(self, x: int, y: int) -> bool:
-        # Паттерны поиска
-        if (x < 7 and y < 7) or (x > self.size - 8 and y < 7) or (x < 7 and y > self.size - 8):
-            return True
+        bits = _format_bits(self.error_correction, self.mask_pattern)
+        for i, y, x in self._format_modules():
+            self.matrix[y, x] = (bits >> i) & 1
+    
+    def _format_modules(self) -> List[tuple]:
+        """Координаты (бит, y, x) обеих копий информации о формате"""
+        size = self.size
+        
+        # Копия вокруг левого верхнего паттерна поиска (тайминг-паттерн пропускается)
+        modules = [(i, i, 8) for i in range(6)]
+        modules += [(6, 7, 8), (7, 8, 8), (8, 8, 7)]
+        modules += [(i, 8, 14 - i) for i in range(9, 15)]
+        
+        # Копия у правого верхнего и левого нижнего паттернов
+        modules += [(i, 8, size - 1 - i) for i in range(8)]
+        modules += [(i, size - 15 + i, 8) for i in range(8, 15)]
+        
+        return modules
+    
+    def _add_data(self, data: np.ndarray):
+        # Размещение данных зигзагом в заранее вычисленном порядке
+        order = self._placement_order[:len(data)]
+        flat = self.matrix.ravel()
+        flat[order] = np.asarray(data[:len(order)], dtype=bool)
+    
+    def _build_function_mask(self) -> np.ndarray:
+        """Маска модулей, занятых служебными паттернами"""
+        size = self.size
+        func_mask = np.zeros((size, size), dtype=bool)
+        
+        # Паттерны поиска и область информации о формате
+        func_mask[:9, :9] = True
+        func_mask[:9, size - 8:] = True
+        func_mask[size - 8:, :9] = True
         
         # Тайминг-паттерны
-        if x == 6 or y == 6:
-            return True
+        func_mask[6, :] = True
+        func_mask[:, 6] = True
+        
+        # Выравнивающие паттерны
+        for x, y in _ALIGNMENT_POSITIONS_BY_VERSION[self.version]:
+            func_mask[y - 2:y + 3, x - 2:x + 3] = True
+        
+        # Информация о версии (версии 7+)
+        if self.version >= 7:
+            func_mask[:6, size - 11:size - 8] = True
+            func_mask[size - 11:size - 8, :6] = True
+        
+        return func_mask
+    
+    def _build_placement_order(self) -> np.ndarray:
+        """Плоские индексы свободных модулей в порядке обхода зигзагом"""
+        size = self.size
+        rows = np.arange(size)
+        
+        # Пары столбцов справа налево, столбец 6 (тайминг) пропускается
+        columns = list(range(size - 1, 7, -2)) + [5, 3, 1]
         
-        # Область информации о формате
-        if (x < 9 and y < 9) or (x > self.size - 9 and y < 9) or (x < 9 and y > self.size - 9):
-            return True
+        chunks = []
+        upward = True
+        for right in columns:
+            ys = rows[::-1] if upward else rows
+            pair = np.stack([ys * size + right, ys * size + right - 1], axis=1)
+            chunks.append(pair.ravel())
+            upward = not upward
         
-        return False
+        order = np.concatenate(chunks)
+        return order[~self._func_mask.ravel()[order]]
+    
+    def _build_data_masks(self) -> np.ndarray:
+        """Все 8 масок стандарта вне служебных паттернов, упакованные по 8 модулей в байт"""
+        yy, xx = np.indices((self.size, self.size))
+        masks = np.stack([pattern(yy, xx) for pattern in _MASK_PATTERNS])
+        masks &= ~self._func_mask
+        
+        return np.packbits(masks, axis=2, bitorder='little')
+    
+    def _build_mask_lines(self) -> tuple:
+        """Строки и столбцы каждой маски как битовые маски для оценки штрафа"""
+        mask_lines = []
+        for packed in self._data_masks:
+            mask = self._unpack_rows(packed)
+            mask_lines.append((tuple(self._pack_rows(mask)), tuple(self._pack_rows(mask.T))))
+        
+        return tuple(mask_lines)
     
     def _apply_mask(self):
+        """Выбор маски с наименьшим штрафом"""
+        # Матрица упаковывается один раз, маски накладываются XOR по строкам
+        rows = self._pack_rows(self.matrix)
+        cols = self._pack_rows(self.matrix.T)
+        format_modules = self._format_modules()
+        
+        scores = []
+        for pattern, (mask_rows, mask_cols) in enumerate(self._mask_lines):
+            masked_rows = [row ^ mask for row, mask in zip(rows, mask_rows)]
+            masked_cols = [col ^ mask for col, mask in zip(cols, mask_cols)]
+            
+            # Область формата в шаблоне пустая: оцениваем с битами формата этой маски
+            bits = _format_bits(self.error_correction, pattern)
+            for i, y, x in format_modules:
+                if (bits >> i) & 1:
+                    masked_rows[y] |= 1 << x
+                    masked_cols[x] |= 1 << y
+            
+            scores.append(self._penalty(masked_rows, masked_cols))
+        
+        self.mask_pattern = scores.index(min(scores))
+        self.matrix ^= self._unpack_rows(self._data_masks[self.mask_pattern])
+    
+    def _penalty(self, rows: List[int], cols: List[int]) -> int:
+        """Штраф маскированной матрицы (правила N1-N4)"""
+        total = self.size * self.size
+        dark = sum(bin(row).count('1') for row in rows)
+        
+        score = self._line_penalty(rows) + self._line_penalty(cols)
+        score += self._block_penalty(rows)
+        score += abs(dark * 20 - total * 10) // total * 10
+        
+        return score
+    
+    def _pack_rows(self, matrix: np.ndarray) -> List[int]:
+        """Строки матрицы как целые числа: бит i соответствует модулю i"""
+        packed = np.packbits(matrix, axis=1, bitorder='little')
+        return [int.from_bytes(row.tobytes(), 'little') for row in packed]
+    
+    def _unpack_rows(self, packed: np.ndarray) -> np.ndarray:
+        return np.unpackbits(packed, axis=1, count=self.size, bitorder='little')
+    
+    def _line_penalty(self, lines: List[int]) -> int:
+        """N1: серии из 5+ модулей одного цвета, N3: паттерн 1:1:3:1:1"""
+        full = (1 << self.size) - 1
+        finder_valid = (1 << (self.size - 10)) - 1
+        score = 0
+        
+        for line in lines:
+            for bits in (line, ~line & full):
+                # Начала серий длиной 5: каждая серия длины L дает L - 4 бита
+                run5 = bits & (bits >> 1) & (bits >> 2) & (bits >> 3) & (bits >> 4)
+                starts = run5 & ~(run5 << 1)
+                score += bin(run5).count('1') + 2 * bin(starts).count('1')
+            
+            light = ~line & full
+            for pattern in _FINDER_LIKE:
+                match = finder_valid
+                for k, bit in enumerate(pattern):
+                    match &= (line if bit else light) >> k
+                score += 40 * bin(match).count('1')
+        
+        return score
+    
+    def _block_penalty(self, rows: List[int]) -> int:
+        """N2: блоки 2x2 одного цвета"""
+        full = (1 << self.size) - 1
+        pair_valid = full >> 1
+        score = 0
+        
+        for upper, lower in zip(rows, rows[1:]):
+            dark = upper & lower
+            light = ~(upper | lower) & full
+            blocks = (dark & (dark >> 1)) | (light & (light >> 1))
+            score += 3 * bin(blocks & pair_valid).count('1')
+        
+        return score
 
-        for y in range(self.size):
-            for x in range(self.size):
-                if not self._is_function_pattern(x, y):
-                    if (x + y) % 3 == 0:  
-                        self.matrix[y][x] = not self.matrix[y][x]
+@lru_cache(maxsize=40)
+def _function_template(version: int) -> tuple:
+    """Матрица со служебными паттернами, маски и порядок размещения данных"""
+    mc = MatrixConstructor(version)
+    mc._add_finder_patterns()
+    mc._add_alignment_patterns()
+    mc._add_timing_patterns()
+    mc._add_dark_module()
+    mc._func_mask = mc._build_function_mask()
+    mc._data_masks = mc._build_data_masks()
+    mc._mask_lines = mc._build_mask_lines()
+    mc._placement_order = mc._build_placement_order()
+    
+    # Общие для всех экземпляров массивы защищены от записи
+    for array in (mc.matrix, mc._func_mask, mc._data_masks, mc._placement_order):
+        array.flags.writeable = False
+    
+    return mc.matrix, mc._func_mask, mc._data_masks, mc._mask_lines, mc._placement_order
 
 class QRCode:
     
     def __init__(self, version: int = 1, error_correction: ErrorCorrectionLevel = ErrorCorrectionLevel.M):
 
+        _check_version(version)
         self.version = version
         self.error_correction = error_correction
         self.size = self._calculate_size()
@@ -257,13 +536,13 @@ class QRCode:
         # Инициализация компонентов
         self.encoder = DataEncoder(version, error_correction)
         self.error_corrector = ReedSolomon()
-        self.matrix_constructor = MatrixConstructor(version)
+        self.matrix_constructor = MatrixConstructor(version, error_correction)
         
     def _calculate_size(self) -> int:
         """Вычисление размера матрицы на основе версии"""
-        return (self.version - 1) * 4 + 21
+        return _SIZE_BY_VERSION[self.version]
     
-    def generate(self, data: str) -> List[List[bool]]:
+    def generate(self, data: str) -> np.ndarray:
     
         # Шаг 1: Кодирование данных
         encoded_data = self.encoder.encode(data)
@@ -283,21 +562,11 @@ class QRCode:
     def save_as_image(self, data: str, filename: str, scale: int = 10):
       
         try:
-            matrix = self.generate(data)
-            size = len(matrix)
-            
-            # Создание изображения
-            img_size = size * scale
-            img = Image.new('RGB', (img_size, img_size), 'white')
-            pixels = img.load()
+            matrix = np.asarray(self.generate(data), dtype=np.uint8)
             
-            # Отрисовка QR-кода
-            for y in range(size):
-                for x in range(size):
-                    color = (0, 0, 0) if matrix[y][x] else (255, 255, 255)
-                    for dy in range(scale):
-                        for dx in range(scale):
-                            pixels[x * scale + dx, y * scale + dy] = color
+            # Масштабирование матрицы: черный модуль -> 0, белый -> 255
+            pixels = np.kron(1 - matrix, np.ones((scale, scale), dtype=np.uint8)) * 255
+            img = Image.fromarray(pixels)
             
             img.save(filename)
             print(f"QR-код сохранен как {filename}")
@@ -310,13 +579,9 @@ class QRCode:
         Вывод QR-кода
         """
         matrix = self.generate(data)
-        size = len(matrix)
         
-        for y in range(size):
-            line = ""
-            for x in range(size):
-                line += "██" if matrix[y][x] else "  "
-            print(line)
+        cells = np.where(matrix, "██", "  ")
+        print("\n".join("".join(row) for row in cells))
 
 def main():
     print("QR Code Generator Library Demo")
@@ -245,16 +245,13 @@ class QRCodeGenerator:
             # Создаем изображение
             img_size = self.size * scale
             img = Image.new('RGB', (img_size, img_size), 'white')
-            pixels = img.load()
+            black = Image.new('RGB', (scale, scale), (0, 0, 0))
             
+            # Фон уже белый, поэтому вставляем только черные модули
             for y in range(self.size):
                 for x in range(self.size):
-                    color = (0, 0, 0) if qr_matrix[y][x] else (255, 255, 255)
-                    for dy in range(scale):
-                        for dx in range(scale):
-                            px = x * scale + dx
-                            py = y * scale + dy
-                            pixels[px, py] = color
+                    if qr_matrix[y][x]:
+                        img.paste(black, (x * scale, y * scale))
             
             img.save(output_filename, "PNG")
             print(f"QR-код сохранен: {output_filename}")